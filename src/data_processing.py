@@ -4,10 +4,14 @@ Social Media Analytics Platform - Data Processing Module
 © 2024 Social Media Analytics Platform. All rights reserved.
 """
 
+import io
 import pandas as pd
 import numpy as np
 import psycopg2
-from sqlalchemy import create_engine
+import connectorx as cx
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection
 import logging
 from typing import Dict, List, Optional, Tuple
 import os
@@ -23,32 +27,160 @@ class SocialMediaDataProcessor:
     Main class for processing social media analytics data
     """
     
-    def __init__(self, db_config: Dict[str, str]):
+    # Content IDs aggregated per engagement query
+    CONTENT_ID_CHUNK_SIZE = 100_000
+    
+    # Parallel connections used per connectorx engagement read
+    READ_PARTITIONS = 8
+    
+    # Frame columns written to each metrics table, mapped to table columns
+    CONTENT_PERFORMANCE_COLUMNS = {
+        'content_id': 'content_id',
+        'likes_count': 'likes_count',
+        'comments_count': 'comments_count',
+        'shares_count': 'shares_count',
+        'saves_count': 'saves_count',
+        'reach_count': 'reach_count',
+        'impressions_count': 'impressions_count',
+        'profile_visits': 'profile_visits',
+        'website_clicks': 'website_clicks',
+        'engagement_rate': 'engagement_rate',
+        'virality_score': 'virality_score'
+    }
+    USER_ENGAGEMENT_COLUMNS = {
+        'user_id': 'user_id',
+        'date': 'date',
+        'posts_created': 'posts_created',
+        'likes_received': 'likes_received',
+        'comments_received': 'comments_received',
+        'shares_received': 'shares_received',
+        'followers_gained': 'followers_gained',
+        'followers_lost': 'followers_lost',
+        'avg_engagement_rate': 'engagement_rate',
+        'reach_count': 'reach_count',
+        'impressions_count': 'impressions_count',
+        'profile_views': 'profile_views',
+        'website_clicks': 'website_clicks'
+    }
+    
+    def __init__(self, db_config: Dict[str, str], seed: Optional[int] = None):
         """
         Initialize the data processor with database configuration
         
         Args:
             db_config: Dictionary containing database connection parameters
+            seed: Optional seed for the simulated metrics random generator
         """
         self.db_config = db_config
         self.engine = self._create_engine()
+        self.rng = np.random.default_rng(seed)
         
+    def _connection_string(self, scheme: str = 'postgresql') -> str:
+        """Build the database connection URL for the given scheme"""
+        return (
+            f"{scheme}://{self.db_config['user']}:{self.db_config['password']}"
+            f"@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
+        )
+    
     def _create_engine(self):
         """Create SQLAlchemy engine for database connection"""
         try:
-            connection_string = (
-                f"postgresql://{self.db_config['user']}:{self.db_config['password']}"
-                f"@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
+            return create_engine(
+                self._connection_string('postgresql+psycopg2'),
+                pool_size=int(self.db_config.get('pool_size', 10)),
+                max_overflow=int(self.db_config.get('max_overflow', 20)),
+                pool_pre_ping=True,
+                pool_recycle=1800
             )
-            return create_engine(connection_string)
         except Exception as e:
             logger.error(f"Failed to create database engine: {e}")
             raise
     
+    def _ensure_table(self, df: pd.DataFrame, table_name: str):
+        """
+        Create a table from the DataFrame's schema if it does not exist yet
+        
+        Existing tables keep their DDL and indexes.
+        
+        Args:
+            df: DataFrame whose columns define the table
+            table_name: Target table name
+        """
+        df.head(0).to_sql(table_name, self.engine, if_exists='append', index=False)
+    
+    @staticmethod
+    def _table_rows(df: pd.DataFrame, columns: Dict[str, str], integer_columns: List[str]) -> pd.DataFrame:
+        """
+        Select and rename frame columns to match a target table
+        
+        Args:
+            df: Source DataFrame
+            columns: Mapping of frame column to table column
+            integer_columns: Table columns stored as INTEGER
+            
+        Returns:
+            pd.DataFrame: Rows shaped like the target table
+        """
+        rows = df[list(columns)].rename(columns=columns)
+        for col in integer_columns:
+            rows[col] = rows[col].round().astype('Int64')
+        return rows
+    
+    @staticmethod
+    def _copy_rows(cursor, df: pd.DataFrame, table_name: str):
+        """
+        Stream a DataFrame into an existing table using PostgreSQL COPY
+        
+        Columns are matched by name, so the frame may cover a subset of the
+        table's columns. The caller owns the transaction.
+        
+        Args:
+            cursor: psycopg2 cursor to copy through
+            df: DataFrame to load
+            table_name: Target table name
+        """
+        # Write missing values as \N so empty strings are not loaded as NULL
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False, na_rep='\\N')
+        buffer.seek(0)
+        
+        columns = ', '.join(f'"{col}"' for col in df.columns)
+        cursor.copy_expert(
+            f"""COPY "{table_name}" ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')""",
+            buffer
+        )
+    
+    def _copy_df(self, df: pd.DataFrame, table_name: str):
+        """
+        Replace the contents of an existing table with a DataFrame
+        
+        The TRUNCATE and COPY commit together.
+        
+        Args:
+            df: DataFrame to load
+            table_name: Target table name
+        """
+        raw_conn = self.engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+            cursor.execute(f'TRUNCATE "{table_name}"')
+            self._copy_rows(cursor, df, table_name)
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+    
     def load_csv_data(self, file_path: str, table_name: str) -> bool:
         """
         Load CSV data into PostgreSQL database
         
+        The table's rows are replaced. A missing table is created from the
+        CSV; an existing table keeps its DDL, so every CSV column must
+        already exist in it and columns absent from the CSV take their
+        defaults.
+        
         Args:
             file_path: Path to CSV file
             table_name: Target table name
@@ -58,102 +190,235 @@ class SocialMediaDataProcessor:
         """
         try:
             df = pd.read_csv(file_path)
-            df.to_sql(table_name, self.engine, if_exists='replace', index=False)
+            self._ensure_table(df, table_name)
+            
+            table_columns = {col['name'] for col in inspect(self.engine).get_columns(table_name)}
+            unknown_columns = [col for col in df.columns if col not in table_columns]
+            if unknown_columns:
+                raise ValueError(
+                    f"CSV columns {unknown_columns} do not exist in table {table_name}"
+                )
+            
+            self._copy_df(df, table_name)
             logger.info(f"Successfully loaded {len(df)} rows into {table_name}")
             return True
         except Exception as e:
             logger.error(f"Failed to load data into {table_name}: {e}")
             return False
     
-    def calculate_engagement_metrics(self) -> pd.DataFrame:
+    def _engagement_metrics_query(self, lo: Optional[int] = None, hi: Optional[int] = None) -> str:
         """
-        Calculate advanced engagement metrics for all content
+        Build the content engagement query with all derived metrics computed in SQL
+        
+        The ID range is applied inside the aggregation so only the matching
+        posts are joined and grouped.
+        
+        Args:
+            lo: Optional inclusive lower bound on content ID
+            hi: Optional exclusive upper bound on content ID
         
         Returns:
-            pd.DataFrame: DataFrame with engagement metrics
+            str: SQL query for content engagement metrics
         """
-        try:
-            query = """
+        id_filter = f"WHERE cp.id >= {int(lo)} AND cp.id < {int(hi)}" if lo is not None else ""
+        
+        return f"""
+            WITH content_engagement AS (
+                SELECT 
+                    cp.id as content_id,
+                    cp.user_id,
+                    cp.content_type,
+                    cp.content_category,
+                    cp.created_at,
+                    COUNT(DISTINCT l.user_id) as likes_count,
+                    COUNT(DISTINCT c.id) as comments_count,
+                    COUNT(DISTINCT s.user_id) as shares_count,
+                    COUNT(DISTINCT sv.user_id) as saves_count,
+                    COUNT(DISTINCT v.user_id) as profile_visits,
+                    COUNT(DISTINCT wc.user_id) as website_clicks
+                FROM content_posts cp
+                LEFT JOIN likes l ON cp.id = l.content_id
+                LEFT JOIN comments c ON cp.id = c.content_id
+                LEFT JOIN shares s ON cp.id = s.content_id
+                LEFT JOIN saves sv ON cp.id = sv.content_id
+                LEFT JOIN profile_visits v ON cp.id = v.content_id
+                LEFT JOIN website_clicks wc ON cp.id = wc.content_id
+                {id_filter}
+                GROUP BY cp.id, cp.user_id, cp.content_type, cp.content_category, cp.created_at
+            ),
+            content_reach AS (
+                -- Reach is simulated until real platform data is available
+                SELECT 
+                    ce.*,
+                    ce.likes_count * (2 + random() * 3) as reach_count
+                FROM content_engagement ce
+            )
             SELECT 
-                cp.id as content_id,
-                cp.user_id,
-                cp.content_type,
-                cp.content_category,
-                cp.created_at,
-                COUNT(DISTINCT l.user_id) as likes_count,
-                COUNT(DISTINCT c.id) as comments_count,
-                COUNT(DISTINCT s.user_id) as shares_count,
-                COUNT(DISTINCT sv.user_id) as saves_count,
-                COUNT(DISTINCT v.user_id) as profile_visits,
-                COUNT(DISTINCT wc.user_id) as website_clicks
-            FROM content_posts cp
-            LEFT JOIN likes l ON cp.id = l.content_id
-            LEFT JOIN comments c ON cp.id = c.content_id
-            LEFT JOIN shares s ON cp.id = s.content_id
-            LEFT JOIN saves sv ON cp.id = sv.content_id
-            LEFT JOIN profile_visits v ON cp.id = v.content_id
-            LEFT JOIN website_clicks wc ON cp.id = wc.content_id
-            GROUP BY cp.id, cp.user_id, cp.content_type, cp.content_category, cp.created_at
+                cr.*,
+                (cr.likes_count + cr.comments_count + cr.shares_count)::float
+                    / GREATEST(cr.likes_count, 1) * 100 as engagement_rate,
+                cr.shares_count * 0.4 + cr.comments_count * 0.3 + cr.saves_count * 0.3 as virality_score,
+                cr.reach_count * (1.2 + random() * 0.8) as impressions_count
+            FROM content_reach cr
             """
+    
+    def _content_id_bounds(self, conn: Connection) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Get the smallest and largest content post IDs
+        
+        Args:
+            conn: Open connection to query through
             
-            df = pd.read_sql(query, self.engine)
+        Returns:
+            Tuple: (min_id, max_id), both None when there are no posts
+        """
+        min_id, max_id = conn.execute(
+            text("SELECT MIN(id), MAX(id) FROM content_posts")
+        ).one()
+        return min_id, max_id
+    
+    def _read_engagement_metrics(self, lo: int, hi: int) -> pd.DataFrame:
+        """
+        Read engagement metrics for content IDs in [lo, hi) with connectorx
+        
+        The range is split into READ_PARTITIONS sub-ranges fetched over
+        parallel connections, each filtered inside its own aggregation, and
+        the frame is built from Arrow buffers rather than per-row tuples. Arrow
+        output also spares each partition the COUNT(*) pre-pass that the
+        pandas destination runs to size its arrays, which would repeat the
+        join.
+        
+        Args:
+            lo: Inclusive lower bound on content ID
+            hi: Exclusive upper bound on content ID
             
-            # Calculate engagement rate
-            df['engagement_rate'] = (
-                (df['likes_count'] + df['comments_count'] + df['shares_count']) / 
-                df['likes_count'].replace(0, 1) * 100
-            )
+        Returns:
+            pd.DataFrame: DataFrame with engagement metrics
+        """
+        step = max(1, -(-(hi - lo) // self.READ_PARTITIONS))
+        queries = [
+            self._engagement_metrics_query(start, min(start + step, hi))
+            for start in range(lo, hi, step)
+        ]
+        return cx.read_sql(self._connection_string(), queries, return_type='arrow').to_pandas()
+    
+    def calculate_engagement_metrics(self, conn: Optional[Connection] = None) -> pd.DataFrame:
+        """
+        Calculate advanced engagement metrics for all content
+        
+        Without an open connection the result is fetched in parallel
+        partitions with connectorx.
+        
+        Args:
+            conn: Optional open connection to reuse instead of the engine
+        
+        Returns:
+            pd.DataFrame: DataFrame with engagement metrics
+        """
+        try:
+            if conn is not None:
+                return pd.read_sql(self._engagement_metrics_query(), conn)
             
-            # Calculate virality score
-            df['virality_score'] = (
-                df['shares_count'] * 0.4 + 
-                df['comments_count'] * 0.3 + 
-                df['saves_count'] * 0.3
-            )
+            with self.engine.connect() as bounds_conn:
+                min_id, max_id = self._content_id_bounds(bounds_conn)
             
-            # Calculate reach and impressions (simulated)
-            df['reach_count'] = df['likes_count'] * np.random.uniform(2, 5, len(df))
-            df['impressions_count'] = df['reach_count'] * np.random.uniform(1.2, 2.0, len(df))
+            if min_id is None:
+                return pd.DataFrame()
             
-            return df
+            return self._read_engagement_metrics(min_id, max_id + 1)
             
         except Exception as e:
             logger.error(f"Failed to calculate engagement metrics: {e}")
             return pd.DataFrame()
     
-    def update_content_performance_metrics(self) -> bool:
+    def update_content_performance_metrics(self, conn: Optional[Connection] = None) -> bool:
         """
         Update content performance metrics table
         
+        Aggregates content in ID ranges so neither the database join nor the
+        result set ever covers the full table at once.
+        
+        Args:
+            conn: Optional open connection to read through
+        
         Returns:
             bool: Success status
         """
         try:
-            metrics_df = self.calculate_engagement_metrics()
+            total_rows = 0
+            write_conn = self.engine.raw_connection()
             
-            if metrics_df.empty:
+            try:
+                cursor = write_conn.cursor()
+                read_conn = conn if conn is not None else self.engine.connect()
+                
+                try:
+                    min_id, max_id = self._content_id_bounds(read_conn)
+                    
+                    if min_id is not None:
+                        # Update the content_performance_metrics table
+                        for lo in range(min_id, max_id + 1, self.CONTENT_ID_CHUNK_SIZE):
+                            chunk = pd.read_sql(
+                                self._engagement_metrics_query(lo, lo + self.CONTENT_ID_CHUNK_SIZE),
+                                read_conn
+                            )
+                            
+                            if chunk.empty:
+                                continue
+                            
+                            rows = self._table_rows(
+                                chunk,
+                                self.CONTENT_PERFORMANCE_COLUMNS,
+                                ['reach_count', 'impressions_count']
+                            )
+                            
+                            # The first non-empty range creates (if needed) and truncates the table
+                            if total_rows == 0:
+                                self._ensure_table(rows, 'content_performance_metrics')
+                                cursor.execute('TRUNCATE "content_performance_metrics"')
+                            
+                            self._copy_rows(cursor, rows, 'content_performance_metrics')
+                            total_rows += len(rows)
+                finally:
+                    if conn is None:
+                        read_conn.close()
+                
+                # The TRUNCATE and every range commit together, so a failed
+                # reload leaves the previous metrics in place
+                write_conn.commit()
+            except Exception:
+                write_conn.rollback()
+                raise
+            finally:
+                write_conn.close()
+            
+            if total_rows == 0:
                 logger.warning("No engagement metrics calculated")
                 return False
             
-            # Update the content_performance_metrics table
-            metrics_df.to_sql(
-                'content_performance_metrics', 
-                self.engine, 
-                if_exists='replace', 
-                index=False
-            )
+            # Downstream user and hashtag queries join on content_id; refresh
+            # planner statistics after the reload
+            with self.engine.begin() as write_conn:
+                write_conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_content_performance_metrics_content "
+                    "ON content_performance_metrics(content_id)"
+                ))
+                write_conn.execute(text("ANALYZE content_performance_metrics"))
             
-            logger.info(f"Updated content performance metrics for {len(metrics_df)} posts")
+            logger.info(f"Updated content performance metrics for {total_rows} posts")
             return True
             
         except Exception as e:
             logger.error(f"Failed to update content performance metrics: {e}")
             return False
     
-    def calculate_user_engagement_metrics(self) -> pd.DataFrame:
+    def calculate_user_engagement_metrics(self, conn: Optional[Connection] = None) -> pd.DataFrame:
         """
         Calculate daily user engagement metrics
         
+        Args:
+            conn: Optional open connection to reuse instead of the engine
+        
         Returns:
             pd.DataFrame: DataFrame with user engagement metrics
         """
@@ -176,13 +441,20 @@ class SocialMediaDataProcessor:
             GROUP BY u.id, DATE(cp.created_at)
             """
             
-            df = pd.read_sql(query, self.engine)
+            df = pd.read_sql(query, conn if conn is not None else self.engine)
+            
+            # Calculate additional metrics (simulated)
+            n_rows = len(df)
+            df['followers_gained'] = self.rng.integers(-5, 20, n_rows, dtype=np.int16)
+            df['followers_lost'] = self.rng.integers(0, 5, n_rows, dtype=np.int16)
+            
+            profile_views = self._uniform(0.1, 0.3, n_rows)
+            profile_views *= df['reach_count'].to_numpy(dtype=np.float32)
+            df['profile_views'] = profile_views
             
-            # Calculate additional metrics
-            df['followers_gained'] = np.random.randint(-5, 20, len(df))
-            df['followers_lost'] = np.random.randint(0, 5, len(df))
-            df['profile_views'] = df['reach_count'] * np.random.uniform(0.1, 0.3, len(df))
-            df['website_clicks'] = df['profile_views'] * np.random.uniform(0.05, 0.15, len(df))
+            website_clicks = self._uniform(0.05, 0.15, n_rows)
+            website_clicks *= profile_views
+            df['website_clicks'] = website_clicks
             
             return df
             
@@ -190,27 +462,49 @@ class SocialMediaDataProcessor:
             logger.error(f"Failed to calculate user engagement metrics: {e}")
             return pd.DataFrame()
     
-    def update_user_engagement_metrics(self) -> bool:
+    def _uniform(self, low: float, high: float, size: int) -> np.ndarray:
+        """
+        Draw float32 samples from U(low, high), scaling the draw in place
+        
+        Args:
+            low: Lower bound
+            high: Upper bound
+            size: Number of samples
+            
+        Returns:
+            np.ndarray: Random samples
+        """
+        samples = self.rng.random(size, dtype=np.float32)
+        samples *= high - low
+        samples += low
+        return samples
+    
+    def update_user_engagement_metrics(self, conn: Optional[Connection] = None) -> bool:
         """
         Update user engagement metrics table
         
+        Args:
+            conn: Optional open connection to read through
+        
         Returns:
             bool: Success status
         """
         try:
-            metrics_df = self.calculate_user_engagement_metrics()
+            metrics_df = self.calculate_user_engagement_metrics(conn)
             
             if metrics_df.empty:
                 logger.warning("No user engagement metrics calculated")
                 return False
             
             # Update the user_engagement_metrics table
-            metrics_df.to_sql(
-                'user_engagement_metrics', 
-                self.engine, 
-                if_exists='replace', 
-                index=False
+            rows = self._table_rows(
+                metrics_df,
+                self.USER_ENGAGEMENT_COLUMNS,
+                ['likes_received', 'comments_received', 'shares_received',
+                 'reach_count', 'impressions_count', 'profile_views', 'website_clicks']
             )
+            self._ensure_table(rows, 'user_engagement_metrics')
+            self._copy_df(rows, 'user_engagement_metrics')
             
             logger.info(f"Updated user engagement metrics for {len(metrics_df)} user-days")
             return True
@@ -219,10 +513,13 @@ class SocialMediaDataProcessor:
             logger.error(f"Failed to update user engagement metrics: {e}")
             return False
     
-    def calculate_hashtag_trends(self) -> pd.DataFrame:
+    def calculate_hashtag_trends(self, conn: Optional[Connection] = None) -> pd.DataFrame:
         """
         Calculate hashtag popularity and trend scores
         
+        Args:
+            conn: Optional open connection to reuse instead of the engine
+        
         Returns:
             pd.DataFrame: DataFrame with hashtag trends
         """
@@ -244,7 +541,7 @@ class SocialMediaDataProcessor:
             GROUP BY h.id, h.tag_name, h.category
             """
             
-            df = pd.read_sql(query, self.engine)
+            df = pd.read_sql(query, conn if conn is not None else self.engine)
             
             # Calculate trend scores
             df['popularity_score'] = df['usage_count_7d'] * 0.6 + df['unique_posts_7d'] * 0.4
@@ -256,31 +553,41 @@ class SocialMediaDataProcessor:
             logger.error(f"Failed to calculate hashtag trends: {e}")
             return pd.DataFrame()
     
-    def update_hashtag_trends(self) -> bool:
+    def update_hashtag_trends(self, conn: Optional[Connection] = None) -> bool:
         """
         Update hashtag trends in the database
         
+        Args:
+            conn: Optional open connection to read through
+        
         Returns:
             bool: Success status
         """
         try:
-            trends_df = self.calculate_hashtag_trends()
+            trends_df = self.calculate_hashtag_trends(conn)
             
             if trends_df.empty:
                 logger.warning("No hashtag trends calculated")
                 return False
             
-            # Update hashtag popularity and trend scores
-            for _, row in trends_df.iterrows():
-                update_query = """
-                UPDATE hashtags 
-                SET popularity_score = %s, trend_score = %s, last_used_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-                """
-                
-                with self.engine.connect() as conn:
-                    conn.execute(update_query, (row['popularity_score'], row['trend_score'], row['hashtag_id']))
-                    conn.commit()
+            # Update hashtag popularity and trend scores in a single batched statement
+            update_query = """
+            UPDATE hashtags
+            SET popularity_score = v.popularity_score,
+                trend_score = v.trend_score,
+                last_used_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(id, popularity_score, trend_score)
+            WHERE hashtags.id = v.id
+            """
+            rows = list(zip(
+                trends_df['hashtag_id'].tolist(),
+                trends_df['popularity_score'].tolist(),
+                trends_df['trend_score'].tolist()
+            ))
+            
+            with self.engine.begin() as write_conn:
+                cursor = write_conn.connection.cursor()
+                execute_values(cursor, update_query, rows, page_size=10000)
             
             logger.info(f"Updated hashtag trends for {len(trends_df)} hashtags")
             return True
@@ -299,17 +606,20 @@ class SocialMediaDataProcessor:
         try:
             logger.info("Starting comprehensive metrics processing...")
             
-            # Update content performance metrics
-            if not self.update_content_performance_metrics():
-                return False
-            
-            # Update user engagement metrics
-            if not self.update_user_engagement_metrics():
-                return False
-            
-            # Update hashtag trends
-            if not self.update_hashtag_trends():
-                return False
+            # Share one pooled connection for the reads of all three phases; autocommit
+            # keeps it from holding locks while other connections TRUNCATE and COPY
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                # Update content performance metrics
+                if not self.update_content_performance_metrics(conn):
+                    return False
+                
+                # Update user engagement metrics
+                if not self.update_user_engagement_metrics(conn):
+                    return False
+                
+                # Update hashtag trends
+                if not self.update_hashtag_trends(conn):
+                    return False
             
             logger.info("Successfully processed all analytics metrics")
             return True
@@ -113,7 +113,7 @@ CREATE TABLE user_engagement_metrics (
     shares_received INTEGER DEFAULT 0,
     followers_gained INTEGER DEFAULT 0,
     followers_lost INTEGER DEFAULT 0,
-    engagement_rate DECIMAL(5,2) DEFAULT 0.0,
+    engagement_rate DECIMAL(8,2) DEFAULT 0.0,
     reach_count INTEGER DEFAULT 0,
     impressions_count INTEGER DEFAULT 0,
     profile_views INTEGER DEFAULT 0,
@@ -135,8 +135,8 @@ CREATE TABLE content_performance_metrics (
     impressions_count INTEGER DEFAULT 0,
     profile_visits INTEGER DEFAULT 0,
     website_clicks INTEGER DEFAULT 0,
-    engagement_rate DECIMAL(5,2) DEFAULT 0.0,
-    virality_score DECIMAL(5,2) DEFAULT 0.0,
+    engagement_rate DECIMAL(8,2) DEFAULT 0.0,
+    virality_score DECIMAL(8,2) DEFAULT 0.0,
     peak_engagement_time TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -218,9 +218,11 @@ CREATE INDEX idx_users_engagement_score ON users(engagement_score);
 CREATE INDEX idx_users_account_type ON users(account_type);
 CREATE INDEX idx_content_posts_created_at ON content_posts(created_at);
 CREATE INDEX idx_content_posts_category ON content_posts(content_category);
+CREATE INDEX idx_content_posts_user_created_at ON content_posts(user_id, created_at);
 CREATE INDEX idx_comments_sentiment ON comments(sentiment_score);
 CREATE INDEX idx_user_engagement_metrics_date ON user_engagement_metrics(date);
 CREATE INDEX idx_content_performance_metrics_engagement ON content_performance_metrics(engagement_rate);
+CREATE INDEX idx_content_performance_metrics_content ON content_performance_metrics(content_id);
 CREATE INDEX idx_hashtags_popularity ON hashtags(popularity_score);
 CREATE INDEX idx_hashtags_trend ON hashtags(trend_score);
 
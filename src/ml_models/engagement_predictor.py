@@ -6,9 +6,10 @@ Social Media Analytics Platform - Engagement Prediction Model
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+import lightgbm as lgb
+from sklearn.inspection import permutation_importance
 from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
 import logging
@@ -27,8 +28,8 @@ class EngagementPredictor:
     
     def __init__(self):
         self.model = None
-        self.scaler = StandardScaler()
-        self.label_encoders = {}
+        self.scaler = None
+        self.categories = {}
         self.feature_columns = []
         self.is_trained = False
         
@@ -43,37 +44,43 @@ class EngagementPredictor:
             pd.DataFrame: Processed DataFrame with features
         """
         try:
-            # Create a copy to avoid modifying original
-            features_df = df.copy()
+            # Build only the feature columns instead of copying the raw frame
+            features_df = pd.DataFrame(index=df.index)
             
-            # Extract temporal features
-            features_df['posting_hour'] = pd.to_datetime(features_df['created_at']).dt.hour
-            features_df['posting_day'] = pd.to_datetime(features_df['created_at']).dt.dayofweek
-            features_df['posting_month'] = pd.to_datetime(features_df['created_at']).dt.month
-            features_df['is_weekend'] = (features_df['posting_day'] >= 5).astype(int)
+            # Extract temporal features (parse timestamps once)
+            created_at = pd.to_datetime(df['created_at'], cache=True)
+            features_df['posting_hour'] = created_at.dt.hour.fillna(0).astype('int8')
+            features_df['posting_day'] = created_at.dt.dayofweek.fillna(0).astype('int8')
+            features_df['posting_month'] = created_at.dt.month.fillna(0).astype('int8')
+            features_df['is_weekend'] = (features_df['posting_day'] >= 5).astype('int8')
             
             # Content features
-            features_df['caption_length'] = features_df['caption'].fillna('').str.len()
-            features_df['has_hashtags'] = features_df['hashtags'].notna().astype(int)
-            features_df['has_location'] = features_df['location'].notna().astype(int)
-            features_df['is_promoted'] = features_df['is_promoted'].astype(int)
+            features_df['caption_length'] = df['caption'].fillna('').str.len().astype('int32')
+            features_df['has_hashtags'] = df['hashtags'].notna().astype('int8')
+            features_df['has_location'] = df['location'].notna().astype('int8')
+            features_df['is_promoted'] = df['is_promoted'].fillna(False).astype('int8')
             
             # User features
-            features_df['user_follower_count'] = features_df['follower_count']
-            features_df['user_following_count'] = features_df['following_count']
-            features_df['user_engagement_score'] = features_df['engagement_score']
-            features_df['user_account_type'] = features_df['account_type']
-            
-            # Encode categorical variables
-            categorical_columns = ['content_type', 'content_category', 'user_account_type']
-            
-            for col in categorical_columns:
-                if col in features_df.columns:
-                    if col not in self.label_encoders:
-                        self.label_encoders[col] = LabelEncoder()
-                        features_df[col] = self.label_encoders[col].fit_transform(features_df[col].fillna('Unknown'))
+            features_df['user_follower_count'] = df['follower_count'].fillna(0)
+            features_df['user_following_count'] = df['following_count'].fillna(0)
+            features_df['user_engagement_score'] = df['engagement_score'].fillna(0.0)
+            
+            # Encode categorical variables (categories unseen at fit time become -1)
+            categorical_sources = {
+                'content_type': 'content_type',
+                'content_category': 'content_category',
+                'user_account_type': 'account_type'
+            }
+            
+            for col, source in categorical_sources.items():
+                if source in df.columns:
+                    values = df[source].fillna('Unknown')
+                    if col not in self.categories:
+                        encoded = pd.Categorical(values)
+                        self.categories[col] = encoded.categories
                     else:
-                        features_df[col] = self.label_encoders[col].transform(features_df[col].fillna('Unknown'))
+                        encoded = pd.Categorical(values, categories=self.categories[col])
+                    features_df[col] = encoded.codes.astype('int16')
             
             # Select feature columns
             self.feature_columns = [
@@ -85,7 +92,7 @@ class EngagementPredictor:
             
             # Filter to available columns
             available_columns = [col for col in self.feature_columns if col in features_df.columns]
-            features_df = features_df[available_columns].fillna(0)
+            features_df = features_df[available_columns].astype(np.float32)
             
             return features_df
             
@@ -93,30 +100,44 @@ class EngagementPredictor:
             logger.error(f"Failed to prepare features: {e}")
             return pd.DataFrame()
     
-    def train(self, X: pd.DataFrame, y: pd.Series, model_type: str = 'random_forest') -> Dict:
+    def train(self, X: pd.DataFrame, y: pd.Series, model_type: str = 'lightgbm') -> Dict:
         """
         Train the engagement prediction model
         
         Args:
             X: Feature matrix
             y: Target variable (engagement rate)
-            model_type: Type of model to use ('random_forest' or 'gradient_boosting')
+            model_type: Type of model to use ('lightgbm', 'random_forest' or 'gradient_boosting')
             
         Returns:
             Dict: Training results and metrics
         """
         try:
+            # Models trained here are unscaled; drop any scaler left by a loaded legacy model
+            self.scaler = None
+            
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y, test_size=0.2, random_state=42
             )
             
-            # Scale features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            feature_names = X.columns
+            
+            # Tree models are scale-invariant, so features are used unscaled
+            X_train = X_train.to_numpy(dtype=np.float32)
+            X_test = X_test.to_numpy(dtype=np.float32)
             
             # Initialize model
-            if model_type == 'random_forest':
+            if model_type == 'lightgbm':
+                self.model = lgb.LGBMRegressor(
+                    n_estimators=200,
+                    num_leaves=63,
+                    colsample_bytree=0.8,
+                    random_state=42,
+                    n_jobs=-1,
+                    verbose=-1
+                )
+            elif model_type == 'random_forest':
                 self.model = RandomForestRegressor(
                     n_estimators=100,
                     max_depth=10,
@@ -124,8 +145,8 @@ class EngagementPredictor:
                     n_jobs=-1
                 )
             elif model_type == 'gradient_boosting':
-                self.model = GradientBoostingRegressor(
-                    n_estimators=100,
+                self.model = HistGradientBoostingRegressor(
+                    max_iter=100,
                     max_depth=6,
                     learning_rate=0.1,
                     random_state=42
@@ -134,10 +155,10 @@ class EngagementPredictor:
                 raise ValueError(f"Unknown model type: {model_type}")
             
             # Train model
-            self.model.fit(X_train_scaled, y_train)
+            self.model.fit(X_train, y_train)
             
             # Make predictions
-            y_pred = self.model.predict(X_test_scaled)
+            y_pred = self.model.predict(X_test)
             
             # Calculate metrics
             mse = mean_squared_error(y_test, y_pred)
@@ -147,7 +168,7 @@ class EngagementPredictor:
             
             # Cross-validation score
             cv_scores = cross_val_score(
-                self.model, X_train_scaled, y_train, cv=5, scoring='r2'
+                self.model, X_train, y_train, cv=5, scoring='r2'
             )
             
             self.is_trained = True
@@ -160,10 +181,10 @@ class EngagementPredictor:
                 'r2': r2,
                 'cv_mean': cv_scores.mean(),
                 'cv_std': cv_scores.std(),
-                'feature_importance': dict(zip(
-                    self.feature_columns, 
-                    self.model.feature_importances_
-                ))
+                'feature_importance': pd.Series(
+                    self._feature_importances(X_test, y_test),
+                    index=feature_names
+                )
             }
             
             logger.info(f"Model trained successfully. R² Score: {r2:.4f}")
@@ -173,6 +194,28 @@ class EngagementPredictor:
             logger.error(f"Failed to train model: {e}")
             return {}
     
+    def _feature_importances(self, X_test: np.ndarray, y_test: pd.Series) -> np.ndarray:
+        """
+        Get feature importances from the trained model
+        
+        Models without impurity-based importances (histogram gradient boosting)
+        fall back to permutation importance on the held-out set.
+        
+        Args:
+            X_test: Test feature matrix
+            y_test: Test target variable
+            
+        Returns:
+            np.ndarray: Importance per feature column
+        """
+        if hasattr(self.model, 'feature_importances_'):
+            return self.model.feature_importances_
+        
+        result = permutation_importance(
+            self.model, X_test, y_test, n_repeats=5, random_state=42, n_jobs=-1
+        )
+        return result.importances_mean
+    
     def predict(self, X: pd.DataFrame) -> np.ndarray:
         """
         Make predictions using trained model
@@ -190,11 +233,14 @@ class EngagementPredictor:
             # Prepare features
             X_processed = self.prepare_features(X)
             
-            # Scale features
-            X_scaled = self.scaler.transform(X_processed)
+            X_values = X_processed.to_numpy()
+            
+            # Models saved before scaling was dropped still carry a fitted scaler
+            if self.scaler is not None:
+                X_values = self.scaler.transform(X_processed).astype(np.float32, copy=False)
             
             # Make predictions
-            predictions = self.model.predict(X_scaled)
+            predictions = self.model.predict(X_values)
             
             return predictions
             
@@ -219,7 +265,7 @@ class EngagementPredictor:
             model_data = {
                 'model': self.model,
                 'scaler': self.scaler,
-                'label_encoders': self.label_encoders,
+                'categories': self.categories,
                 'feature_columns': self.feature_columns,
                 'is_trained': self.is_trained
             }
@@ -249,8 +295,16 @@ class EngagementPredictor:
             model_data = joblib.load(filepath)
             
             self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.label_encoders = model_data['label_encoders']
+            self.scaler = model_data.get('scaler')
+            # Older model files store fitted LabelEncoders; their sorted
+            # classes map to the same codes as pandas categories
+            if 'categories' in model_data:
+                self.categories = model_data['categories']
+            else:
+                self.categories = {
+                    col: pd.Index(encoder.classes_)
+                    for col, encoder in model_data['label_encoders'].items()
+                }
             self.feature_columns = model_data['feature_columns']
             self.is_trained = model_data['is_trained']
             
@@ -280,28 +334,56 @@ class ContentRecommendationEngine:
             engagement_data: User engagement metrics DataFrame
         """
         try:
-            for _, user in user_data.iterrows():
-                user_id = user['id']
-                
-                # Get user's engagement history
-                user_engagements = engagement_data[engagement_data['user_id'] == user_id]
-                
-                if not user_engagements.empty:
-                    profile = {
-                        'preferred_content_types': user_engagements['content_type'].value_counts().to_dict(),
-                        'preferred_categories': user_engagements['content_category'].value_counts().to_dict(),
-                        'avg_engagement_rate': user_engagements['engagement_rate'].mean(),
-                        'preferred_posting_times': user_engagements['posting_hour'].value_counts().to_dict(),
-                        'hashtag_preferences': user_engagements['hashtags'].value_counts().to_dict()
-                    }
-                    
-                    self.user_profiles[user_id] = profile
+            # Aggregate every user's engagement history in a single pass
+            user_engagements = engagement_data[engagement_data['user_id'].isin(user_data['id'])]
+            grouped = user_engagements.groupby('user_id', sort=False)
+            
+            avg_engagement_rates = grouped['engagement_rate'].mean()
+            performance_levels = self._classify_performance_vec(avg_engagement_rates.to_numpy())
+            # Keep only the top 3 values used for recommendations
+            content_type_counts = self._group_value_counts(grouped['content_type'], top_n=3)
+            category_counts = self._group_value_counts(grouped['content_category'], top_n=3)
+            posting_time_counts = self._group_value_counts(grouped['posting_hour'], top_n=3)
+            hashtag_counts = self._group_value_counts(grouped['hashtags'])
+            
+            for user_id, avg_engagement_rate, performance_level in zip(
+                avg_engagement_rates.index, avg_engagement_rates.tolist(), performance_levels.tolist()
+            ):
+                self.user_profiles[user_id] = {
+                    'preferred_content_types': content_type_counts.get(user_id, []),
+                    'preferred_categories': category_counts.get(user_id, []),
+                    'avg_engagement_rate': avg_engagement_rate,
+                    'performance_level': performance_level,
+                    'preferred_posting_times': posting_time_counts.get(user_id, []),
+                    'hashtag_preferences': dict(hashtag_counts.get(user_id, []))
+                }
             
             logger.info(f"Built profiles for {len(self.user_profiles)} users")
             
         except Exception as e:
             logger.error(f"Failed to build user profiles: {e}")
     
+    @staticmethod
+    def _group_value_counts(grouped_column, top_n: Optional[int] = None) -> Dict:
+        """
+        Count values per group in one groupby pass
+        
+        Args:
+            grouped_column: SeriesGroupBy keyed by user ID
+            top_n: Optional number of most frequent values to keep per user
+            
+        Returns:
+            Dict: Mapping of user ID to [(value, count), ...], most frequent first
+        """
+        value_counts = grouped_column.value_counts()
+        if top_n is not None:
+            value_counts = value_counts.groupby(level=0, sort=False).head(top_n)
+        
+        counts = {}
+        for (user_id, value), count in value_counts.items():
+            counts.setdefault(user_id, []).append((value, count))
+        return counts
+    
     def recommend_content_strategy(self, user_id: int) -> Dict:
         """
         Recommend content strategy for a specific user
@@ -320,24 +402,12 @@ class ContentRecommendationEngine:
             
             # Generate recommendations
             recommendations = {
-                'optimal_posting_times': sorted(
-                    profile['preferred_posting_times'].items(), 
-                    key=lambda x: x[1], 
-                    reverse=True
-                )[:3],
-                'recommended_content_types': sorted(
-                    profile['preferred_content_types'].items(), 
-                    key=lambda x: x[1], 
-                    reverse=True
-                )[:3],
-                'recommended_categories': sorted(
-                    profile['preferred_categories'].items(), 
-                    key=lambda x: x[1], 
-                    reverse=True
-                )[:3],
+                'optimal_posting_times': profile['preferred_posting_times'],
+                'recommended_content_types': profile['preferred_content_types'],
+                'recommended_categories': profile['preferred_categories'],
                 'engagement_insights': {
                     'avg_engagement_rate': profile['avg_engagement_rate'],
-                    'performance_level': self._classify_performance(profile['avg_engagement_rate'])
+                    'performance_level': profile['performance_level']
                 }
             }
             
@@ -357,14 +427,24 @@ class ContentRecommendationEngine:
         Returns:
             str: Performance level classification
         """
-        if engagement_rate >= 8.0:
-            return "Excellent"
-        elif engagement_rate >= 5.0:
-            return "Good"
-        elif engagement_rate >= 3.0:
-            return "Average"
-        else:
-            return "Needs Improvement"
+        return str(self._classify_performance_vec(np.array([engagement_rate]))[0])
+    
+    @staticmethod
+    def _classify_performance_vec(engagement_rates: np.ndarray) -> np.ndarray:
+        """
+        Classify performance levels for an array of engagement rates at once
+        
+        Args:
+            engagement_rates: Array of average engagement rates
+            
+        Returns:
+            np.ndarray: Performance level classification per rate
+        """
+        return np.select(
+            [engagement_rates >= 8.0, engagement_rates >= 5.0, engagement_rates >= 3.0],
+            ["Excellent", "Good", "Average"],
+            default="Needs Improvement"
+        )
 
 def main():
     """Main function for model training and evaluation"""
@@ -402,7 +482,7 @@ def main():
     y = pd.Series(engagement_rates)
     
     # Train model
-    results = predictor.train(X, y, model_type='random_forest')
+    results = predictor.train(X, y, model_type='lightgbm')
     
     print("Model Training Results:")
     print(f"R² Score: {results['r2']:.4f}")